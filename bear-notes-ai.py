@@ -6,30 +6,104 @@ Enhanced version with incremental processing and token management
 
 import sqlite3
 import argparse
+import logging
 import os
 import re
 import time
 import json
 import urllib.parse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import subprocess
 from math import ceil
 from typing import List, Dict, Any, Optional
 import tiktoken
 import concurrent.futures
+import functools
+import threading
+
+
+logger = logging.getLogger("bear_notes_ai")
+
+# Shared HTTP session so repeated calls to the same model endpoint reuse pooled
+# keep-alive connections instead of paying a TCP/TLS handshake per request.
+# Only failed connections are retried: every call is a POST, and re-sending a
+# completion request the server may already have handled isn't safe
+_http = requests.Session()
+_http_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32,
+                            max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2))
+_http.mount("http://", _http_adapter)
+_http.mount("https://", _http_adapter)
+_http.headers.update({"Content-Type": "application/json"})
+
+OPENAI_CHAT_COMPLETIONS_URL = "https://api.openai.com/v1/chat/completions"
+
+FTS_INDEX_PATH = "~/.cache/bear-notes-ai/fts.sqlite"
+# Bumped whenever the index layout changes, so older indexes get rebuilt
+FTS_INDEX_VERSION = 2
+
+NOTE_SEPARATOR = "\n\n===== NOTE SEPARATOR =====\n\n"
+
+# Seconds between the Unix epoch and Core Data's reference date (2001-01-01)
+COCOA_EPOCH_OFFSET = 978307200
+
+
+@functools.lru_cache(maxsize=32)
+def _tag_regex(tag):
+    # '#tag' followed by anything but another tag character, so nested tags
+    # ('#tag/child') match but longer tags ('#tagged', '#tag-2') don't
+    return re.compile(f"#{re.escape(tag)}(?![\\w-])", re.IGNORECASE)
+
+
+# Tags as has_tag() sees them: '#' followed by word characters, '-' and '/'
+TAG_REGEX = re.compile(r"#([\w/-]+)")
+
+
+def extract_tags(text):
+    """Return the set of (lowercased) tags in a note's text"""
+    if not text:
+        return set()
+    return {tag.lower() for tag in TAG_REGEX.findall(text)}
+
+
+def note_has_tag(text, tag):
+    """SQLite function has_tag(text, tag): 1 if the text contains #tag as a whole tag"""
+    if text is None or not tag:
+        return 0
+    return 1 if _tag_regex(tag).search(text) else 0
 
 
 class BearNotesAI:
+    # LIKE search against the Bear database. Unused filters are bound as NULL,
+    # so every search shape shares one statement in sqlite3's statement cache
+    _SQL_SEARCH = """
+    SELECT ZUNIQUEIDENTIFIER AS id, ZTITLE AS title, coalesce(ZMODIFICATIONDATE, 0) AS modified
+    FROM ZSFNOTE
+    WHERE ZTRASHED = 0
+        AND (?1 IS NULL OR (ZTEXT LIKE ?1 ESCAPE '\\' AND has_tag(ZTEXT, ?2)))
+        AND (?3 IS NULL OR ZTITLE LIKE ?3 ESCAPE '\\' OR ZTEXT LIKE ?3 ESCAPE '\\')
+    ORDER BY ZMODIFICATIONDATE DESC
+    LIMIT ?4
+    """
+
     def __init__(self, use_chatgpt=False, use_docker_model=False, model_name="llama3", api_key=None,
                  ollama_host="http://localhost:11434", docker_model_endpoint=None,
-                 max_tokens=4000, chunking_strategy="auto", overlap_tokens=100):
+                 max_tokens=4000, chunking_strategy="auto", overlap_tokens=100, max_workers=1):
         self.bear_db_path = os.path.expanduser(
             "~/Library/Group Containers/9K33E3U3T4.net.shinyfrog.bear/Application Data/database.sqlite"
         )
+        # Sidecar full-text index (Bear's own database is never written to)
+        self.fts_index_path = os.path.expanduser(FTS_INDEX_PATH)
+        self.use_fts_index = True
+        self._bear_conn = None
+        self._fts_conn = None
         self.use_chatgpt = use_chatgpt
         self.use_docker_model = use_docker_model
         self.model_name = model_name
         self.api_key = api_key
+        # Built once rather than on every ChatGPT request
+        self._chatgpt_headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
         self.ollama_host = ollama_host
         # Docker Model Runner endpoint (OpenAI compatible API)
         self.docker_model_endpoint = docker_model_endpoint or "http://model-runner.docker.internal/engines/v1"
@@ -39,6 +113,10 @@ class BearNotesAI:
         self.chunking_strategy = chunking_strategy
         self.overlap_tokens = overlap_tokens
 
+        # Concurrency for independent model calls (document/chunk summaries)
+        self.max_workers = max(1, max_workers)
+        self._model_slots = threading.BoundedSemaphore(self.max_workers)
+
         # Initialize tokenizer based on model
         self.tokenizer = self._initialize_tokenizer()
 
@@ -59,7 +137,7 @@ class BearNotesAI:
                 # This is a rough approximation for most models
                 return SimpleTokenizer()
         except Exception as e:
-            print(f"Warning: Couldn't initialize tokenizer: {e}")
+            logger.warning("Warning: Couldn't initialize tokenizer: %s", e)
             return SimpleTokenizer()
 
     def _get_model_params(self):
@@ -70,34 +148,34 @@ class BearNotesAI:
         # If user specified max_tokens, always use that as context window
         if self.max_tokens > 0:
             context_window = self.max_tokens
-            print(f"Using user-provided context window size: {context_window} tokens")
+            logger.info("Using user-provided context window size: %d tokens", context_window)
         else:
             # Use reasonable defaults based on model type
             if self.use_chatgpt:
                 # For ChatGPT, use a large default without API query
                 context_window = 128000  # Maximum possible
-                print(f"Using maximum possible context window for ChatGPT initially")
-                print(f"(Will adjust based on API errors if content is too large)")
+                logger.info("Using maximum possible context window for ChatGPT initially")
+                logger.info("(Will adjust based on API errors if content is too large)")
             elif self.use_docker_model:
                 # For Docker models, don't try to query - use a reasonable default
                 context_window = 32000  # Reasonable default for most modern models
-                print(f"Using default context window for Docker Model: {context_window} tokens")
-                print(f"(Specify --max-tokens to override this value)")
+                logger.info("Using default context window for Docker Model: %d tokens", context_window)
+                logger.info("(Specify --max-tokens to override this value)")
             else:
                 # For Ollama models, try to extract context info from model info
                 context_window = self._extract_ollama_context_window()
                 if not context_window:
                     context_window = 32000  # Reasonable default for most modern models
-                    print(f"Using default context window for Ollama: {context_window} tokens")
-                    print(f"(Specify --max-tokens to override this value)")
+                    logger.info("Using default context window for Ollama: %d tokens", context_window)
+                    logger.info("(Specify --max-tokens to override this value)")
 
         # Calculate optimal parameters based on detected context window
         params = self._calculate_params_from_context_window(context_window)
 
-        print(f"Model parameters for {self.model_name}:")
-        print(f"- Context window: {params['context_window']} tokens")
-        print(f"- Optimal chunk size: {params['optimal_chunk_size']} tokens")
-        print(f"- Reserved for response: {params['response_tokens']} tokens")
+        logger.info("Model parameters for %s:", self.model_name)
+        logger.info("- Context window: %d tokens", params['context_window'])
+        logger.info("- Optimal chunk size: %d tokens", params['optimal_chunk_size'])
+        logger.info("- Reserved for response: %d tokens", params['response_tokens'])
 
         return params
 
@@ -108,7 +186,7 @@ class BearNotesAI:
         """
         try:
             # Try to get model info from Ollama
-            response = requests.post(
+            response = _http.post(
                 f"{self.ollama_host}/api/show",
                 json={"name": self.model_name},
                 timeout=5
@@ -148,8 +226,9 @@ class BearNotesAI:
                     if "context_window" in details:
                         return int(details["context_window"])
 
-                # Print model info for debugging
-                print(f"Ollama API response: {json.dumps(model_info, indent=2)}")
+                # Log model info for debugging (skip the JSON dump unless it will be shown)
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("Ollama API response: %s", json.dumps(model_info, indent=2))
 
                 # Do a deep search through the JSON for any keys containing "context" and "length"
                 def search_json(obj, context_keys=None):
@@ -176,11 +255,11 @@ class BearNotesAI:
                 if context_keys:
                     # Use the largest value found
                     largest_context = max(context_keys, key=lambda x: x[1])
-                    print(f"Found context window information: {largest_context[0]} = {largest_context[1]}")
+                    logger.info("Found context window information: %s = %d", largest_context[0], largest_context[1])
                     return largest_context[1]
 
         except Exception as e:
-            print(f"Error querying Ollama API: {e}")
+            logger.warning("Error querying Ollama API: %s", e)
 
         return None
 
@@ -224,113 +303,381 @@ class BearNotesAI:
     def check_bear_db_exists(self):
         return os.path.exists(self.bear_db_path)
 
+    def _bear_db_uri(self):
+        """SQLite URI that opens the Bear database read-only"""
+        return f"file:{urllib.parse.quote(self.bear_db_path)}?mode=ro"
+
+    def _get_bear_connection(self):
+        """
+        Return a single read-only connection to the Bear database, opened on first
+        use and reused for every query so SQLite's page cache stays warm.
+        """
+        if self._bear_conn is None:
+            conn = sqlite3.connect(self._bear_db_uri(), uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.create_function("has_tag", 2, note_has_tag)
+            conn.execute("PRAGMA query_only = ON")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            conn.execute("PRAGMA cache_size = -65536")  # 64 MB
+            conn.execute("PRAGMA mmap_size = 268435456")  # 256 MB
+            self._bear_conn = conn
+        return self._bear_conn
+
+    def close(self):
+        """Close any open database connections"""
+        if self._fts_conn is not None:
+            # Let SQLite refresh the index's query planner statistics if needed
+            try:
+                self._fts_conn.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+        for conn in (self._bear_conn, self._fts_conn):
+            if conn is not None:
+                conn.close()
+        self._bear_conn = None
+        self._fts_conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def get_note_by_id(self, note_id):
+        note = self.get_notes_by_ids([note_id])[0]
+        return note['id'], note['title'], note['content']
+
+    def get_notes_by_ids(self, note_ids):
+        """Fetch notes (with their content) by id, in the order given, one query per batch of ids"""
         if not self.check_bear_db_exists():
             raise FileNotFoundError(f"Bear database not found at {self.bear_db_path}")
 
-        conn = sqlite3.connect(self.bear_db_path)
-        cursor = conn.cursor()
-        query = """
-        SELECT ZUNIQUEIDENTIFIER, ZTITLE, ZTEXT 
-        FROM ZSFNOTE 
-        WHERE ZUNIQUEIDENTIFIER = ? AND ZTRASHED = 0
-        """
-        cursor.execute(query, (note_id,))
-        note = cursor.fetchone()
-        conn.close()
+        rows = self._fetch_notes_in_batches(
+            note_ids, "ZTITLE AS title, coalesce(ZMODIFICATIONDATE, 0) AS modified, ZTEXT AS content",
+            live_only=True
+        )
 
-        if not note:
-            raise ValueError(f"No note found with ID '{note_id}'")
-        return note
+        missing = [note_id for note_id in note_ids if note_id not in rows]
+        if missing:
+            raise ValueError(f"No note found with ID '{missing[0]}'")
+
+        notes = self._format_notes([rows[note_id] for note_id in note_ids])
+        for note in notes:
+            note['content'] = rows[note['id']]['content'] or ""
+        return notes
 
     def extract_note_id_from_url(self, callback_url):
-        if not callback_url.startswith("bear://"):
+        parts = urllib.parse.urlsplit(callback_url)
+        if parts.scheme != "bear":
             raise ValueError("Invalid Bear callback URL format")
 
-        match = re.search(r'id=([^&]+)', callback_url)
-        if not match:
+        # parse_qs also percent-decodes the value
+        note_ids = urllib.parse.parse_qs(parts.query).get("id")
+        if not note_ids:
             raise ValueError("No note ID found in the callback URL")
 
-        note_id = match.group(1)
-        return urllib.parse.unquote(note_id)
+        return note_ids[0]
+
+    def search_notes_by_tag(self, tag, limit=None):
+        return self._search_notes(tag=tag, limit=limit)
+
+    def search_notes_by_keyword(self, keyword, limit=None):
+        return self._search_notes(keyword=keyword, limit=limit)
 
-    def search_notes_by_tag(self, tag):
+    def search_notes_by_tag_and_keyword(self, tag, keyword, limit=None):
+        return self._search_notes(tag=tag, keyword=keyword, limit=limit)
+
+    def _search_notes(self, tag=None, keyword=None, limit=None):
+        """
+        Search live notes, most recently modified first, using the full-text index
+        when it is available. The limit is applied in SQL so SQLite can stop early.
+        """
         if not self.check_bear_db_exists():
             raise FileNotFoundError(f"Bear database not found at {self.bear_db_path}")
 
-        conn = sqlite3.connect(self.bear_db_path)
-        cursor = conn.cursor()
-        tag_pattern = f"%#{tag}%"
-        query = """
-        SELECT ZUNIQUEIDENTIFIER, ZTITLE, ZTEXT, ZMODIFICATIONDATE 
-        FROM ZSFNOTE 
-        WHERE ZTEXT LIKE ? AND ZTRASHED = 0
-        ORDER BY ZMODIFICATIONDATE DESC
-        """
-        cursor.execute(query, (tag_pattern,))
-        notes = cursor.fetchall()
-        conn.close()
+        index_conn = self._ensure_fts_index()
+        if index_conn is not None:
+            notes = self._search_fts_index(index_conn, tag, keyword, limit)
+        else:
+            notes = self._search_bear_db(tag, keyword, limit)
 
         return self._format_notes(notes)
 
-    def search_notes_by_keyword(self, keyword):
-        if not self.check_bear_db_exists():
-            raise FileNotFoundError(f"Bear database not found at {self.bear_db_path}")
+    def _search_bear_db(self, tag=None, keyword=None, limit=None):
+        """Search the Bear database directly with LIKE (full table scan)"""
+        tag_pattern = self._like_pattern(f"#{tag}") if tag else None
+        keyword_pattern = self._like_pattern(keyword) if keyword else None
+
+        # A negative LIMIT means no limit in SQLite
+        params = (tag_pattern, tag, keyword_pattern, limit or -1)
+        return self._get_bear_connection().execute(self._SQL_SEARCH, params).fetchall()
 
-        conn = sqlite3.connect(self.bear_db_path)
-        cursor = conn.cursor()
-        keyword_pattern = f"%{keyword}%"
-        query = """
-        SELECT ZUNIQUEIDENTIFIER, ZTITLE, ZTEXT, ZMODIFICATIONDATE 
-        FROM ZSFNOTE 
-        WHERE (ZTEXT LIKE ? OR ZTITLE LIKE ?) AND ZTRASHED = 0
-        ORDER BY ZMODIFICATIONDATE DESC
+    def _ensure_fts_index(self):
         """
-        cursor.execute(query, (keyword_pattern, keyword_pattern))
-        notes = cursor.fetchall()
-        conn.close()
+        Open the sidecar full-text index of live Bear notes and bring it up to date.
+        The index is an FTS5 table with the trigram tokenizer, so MATCH gives the
+        same case-insensitive substring semantics as LIKE without scanning every
+        note. Returns None (and searches fall back to LIKE) if it can't be built.
+        """
+        if self._fts_conn is not None or not self.use_fts_index:
+            return self._fts_conn
 
-        return self._format_notes(notes)
+        conn = None
+        try:
+            self._secure_fts_index_files()
+            conn = sqlite3.connect(self.fts_index_path, uri=True)
+            conn.row_factory = sqlite3.Row
+            conn.create_function("has_tag", 2, note_has_tag)
+            if conn.execute("PRAGMA user_version").fetchone()[0] != FTS_INDEX_VERSION:
+                # Built by an older version; start over
+                for table in ("notes_fts", "note_tags", "notes"):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute(f"PRAGMA user_version = {FTS_INDEX_VERSION}")
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS notes (
+                id INTEGER PRIMARY KEY,
+                note_id TEXT NOT NULL UNIQUE,
+                modified REAL NOT NULL
+            )
+            """)
+            conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts
+            USING fts5(title, content, tokenize='trigram')
+            """)
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS note_tags (
+                tag TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                PRIMARY KEY (tag, id)
+            ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS note_tags_id ON note_tags(id)")
+            self._sync_fts_index(conn)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("Warning: Couldn't use full-text index, falling back to slower search: %s", e)
+            if conn is not None:
+                conn.close()
+            self.use_fts_index = False
+            return None
+
+        self._fts_conn = conn
+        return conn
+
+    def _secure_fts_index_files(self):
+        """
+        The index holds a plain-text copy of every note, so keep its directory
+        and files private to the user. chmod as well as create with a mode,
+        since makedirs' mode doesn't apply to existing directories.
+        """
+        index_dir = os.path.dirname(self.fts_index_path)
+        os.makedirs(index_dir, mode=0o700, exist_ok=True)
+        os.chmod(index_dir, 0o700)
+        os.close(os.open(self.fts_index_path, os.O_RDWR | os.O_CREAT, 0o600))
+        for suffix in ("", "-journal", "-wal", "-shm"):
+            try:
+                os.chmod(self.fts_index_path + suffix, 0o600)
+            except FileNotFoundError:
+                pass
 
-    def search_notes_by_tag_and_keyword(self, tag, keyword):
-        if not self.check_bear_db_exists():
-            raise FileNotFoundError(f"Bear database not found at {self.bear_db_path}")
+    def _sync_fts_index(self, conn):
+        """
+        Incrementally refresh the index from the (read-only) Bear database.
+        Bear's database can't carry triggers, so compare note ids and
+        modification dates and only re-index notes that were added, changed,
+        trashed or deleted since the last run.
+        """
+        conn.execute("ATTACH DATABASE ? AS bear", (self._bear_db_uri(),))
+        try:
+            with conn:
+                conn.execute("CREATE TEMP TABLE live AS "
+                             "SELECT ZUNIQUEIDENTIFIER AS note_id, coalesce(ZMODIFICATIONDATE, 0) AS modified "
+                             "FROM bear.ZSFNOTE WHERE ZTRASHED = 0")
+                conn.execute("CREATE UNIQUE INDEX temp.live_note_id ON live(note_id)")
+
+                # Drop notes that were deleted, trashed or modified
+                stale = [row[0] for row in conn.execute("""
+                    SELECT n.id FROM notes n LEFT JOIN temp.live l ON l.note_id = n.note_id
+                    WHERE l.note_id IS NULL OR l.modified != n.modified
+                """)]
+                if stale:
+                    conn.executemany("DELETE FROM notes_fts WHERE rowid = ?", ((i,) for i in stale))
+                    conn.executemany("DELETE FROM note_tags WHERE id = ?", ((i,) for i in stale))
+                    conn.executemany("DELETE FROM notes WHERE id = ?", ((i,) for i in stale))
+
+                # (Re)index everything that isn't in the index yet
+                last_id = conn.execute("SELECT coalesce(max(id), 0) FROM notes").fetchone()[0]
+                cursor = conn.execute("""
+                    INSERT INTO notes (note_id, modified)
+                    SELECT l.note_id, l.modified FROM temp.live l
+                    WHERE NOT EXISTS (SELECT 1 FROM notes n WHERE n.note_id = l.note_id)
+                """)
+                if cursor.rowcount > 0:
+                    # A first build or a big catch-up can take a while, so say so even without --verbose
+                    level = logging.WARNING if last_id == 0 or cursor.rowcount >= 1000 else logging.INFO
+                    logger.log(level, "Updating full-text index (%d notes)...", cursor.rowcount)
+                    conn.execute("""
+                        INSERT INTO notes_fts (rowid, title, content)
+                        SELECT n.id, b.ZTITLE, b.ZTEXT
+                        FROM notes n JOIN bear.ZSFNOTE b ON b.ZUNIQUEIDENTIFIER = n.note_id
+                        WHERE n.id > ?
+                    """, (last_id,))
+                    self._index_note_tags(conn, last_id)
+        finally:
+            conn.execute("DROP TABLE IF EXISTS temp.live")
+            conn.execute("DETACH DATABASE bear")
 
-        conn = sqlite3.connect(self.bear_db_path)
-        cursor = conn.cursor()
+    def _index_note_tags(self, conn, last_id):
+        """
+        Fill note_tags for notes indexed after last_id. Tags come from Bear's own
+        note/tag tables when they can be found (so '#tag' inside code blocks
+        isn't counted), otherwise they are parsed out of the note text.
+        """
+        tag_join = self._find_bear_tag_join(conn)
+        if tag_join:
+            join_table, notes_column, tags_column = tag_join
+            rows = conn.execute(f"""
+                SELECT t.ZTITLE, n.id
+                FROM notes n
+                JOIN bear.ZSFNOTE b ON b.ZUNIQUEIDENTIFIER = n.note_id
+                JOIN bear.{join_table} j ON j.{notes_column} = b.Z_PK
+                JOIN bear.ZSFNOTETAG t ON t.Z_PK = j.{tags_column}
+                WHERE n.id > ? AND t.ZTITLE IS NOT NULL
+            """, (last_id,))
+            pairs = {(title.lower(), note_id) for title, note_id in rows}
+        else:
+            rows = conn.execute("SELECT rowid, content FROM notes_fts WHERE rowid > ?", (last_id,))
+            pairs = {(tag, note_id) for note_id, content in rows for tag in extract_tags(content)}
+        conn.executemany("INSERT INTO note_tags (tag, id) VALUES (?, ?)", pairs)
 
-        tag_pattern = f"%#{tag}%"
-        keyword_pattern = f"%{keyword}%"
+    @staticmethod
+    def _find_bear_tag_join(conn):
+        """
+        Find the table joining Bear's notes to their tags. Core Data names it
+        Z_<n>TAGS with Z_<n>NOTES/Z_<m>TAGS columns, and the numbers differ
+        between Bear versions. Returns (table, notes_column, tags_column) or None.
+        """
+        tables = {row[0] for row in conn.execute("SELECT name FROM bear.sqlite_master WHERE type = 'table'")}
+        if "ZSFNOTETAG" not in tables:
+            return None
+
+        for table in sorted(tables):
+            if not re.fullmatch(r"Z_\d+TAGS", table):
+                continue
+            columns = [row[1] for row in conn.execute(f"PRAGMA bear.table_info({table})")]
+            notes_column = next((c for c in columns if re.fullmatch(r"Z_\d+NOTES", c)), None)
+            tags_column = next((c for c in columns if re.fullmatch(r"Z_\d+TAGS", c)), None)
+            if notes_column and tags_column:
+                return table, notes_column, tags_column
+        return None
 
-        query = """
-        SELECT ZUNIQUEIDENTIFIER, ZTITLE, ZTEXT, ZMODIFICATIONDATE 
-        FROM ZSFNOTE 
-        WHERE ZTEXT LIKE ? AND (ZTEXT LIKE ? OR ZTITLE LIKE ?) AND ZTRASHED = 0
-        ORDER BY ZMODIFICATIONDATE DESC
+    def _search_fts_index(self, conn, tag=None, keyword=None, limit=None):
+        """Search the full-text index, returning rows in the same shape as _search_bear_db"""
+        # Trigram MATCH needs at least 3 characters; shorter terms use LIKE
+        match_terms = []
+        conditions = []
+        params = []
+
+        if tag and TAG_REGEX.fullmatch(f"#{tag}"):
+            # Indexed lookup of the tag itself and any nested tags below it
+            # ('/' sorts right before '0', so the range covers 'tag/...')
+            tag_key = tag.lower()
+            conditions.append("n.id IN (SELECT id FROM note_tags WHERE tag = ? OR (tag >= ? AND tag < ?))")
+            params.extend([tag_key, tag_key + "/", tag_key + "0"])
+        elif tag:
+            tag_term = f"#{tag}"
+            if len(tag_term) >= 3:
+                match_terms.append(f"content : {self._fts_phrase(tag_term)}")
+            else:
+                conditions.append("notes_fts.content LIKE ? ESCAPE '\\'")
+                params.append(self._like_pattern(tag_term))
+            # The substring match also finds longer tags (#tag matches #tagged)
+            conditions.append("has_tag(notes_fts.content, ?)")
+            params.append(tag)
+
+        if keyword:
+            if len(keyword) >= 3:
+                match_terms.append(f"{{title content}} : {self._fts_phrase(keyword)}")
+            else:
+                conditions.append("(notes_fts.title LIKE ? ESCAPE '\\' OR notes_fts.content LIKE ? ESCAPE '\\')")
+                params.extend([self._like_pattern(keyword)] * 2)
+
+        if match_terms:
+            conditions.insert(0, "notes_fts MATCH ?")
+            params.insert(0, " AND ".join(match_terms))
+
+        query = f"""
+        SELECT n.note_id AS id, notes_fts.title AS title, n.modified AS modified
+        FROM notes_fts JOIN notes n ON n.id = notes_fts.rowid
+        WHERE {" AND ".join(conditions)}
+        ORDER BY n.modified DESC
+        LIMIT ?
         """
+        params.append(limit or -1)
+        return conn.execute(query, params).fetchall()
 
-        cursor.execute(query, (tag_pattern, keyword_pattern, keyword_pattern))
-        notes = cursor.fetchall()
-        conn.close()
+    @staticmethod
+    def _like_pattern(text):
+        """Build a substring LIKE pattern that treats %, _ and \\ in text literally"""
+        return "%" + re.sub(r"([%_\\])", r"\\\1", text) + "%"
 
-        return self._format_notes(notes)
+    @staticmethod
+    def _fts_phrase(text):
+        """Quote text as a single FTS5 phrase"""
+        return '"' + text.replace('"', '""') + '"'
 
     def _format_notes(self, notes):
+        """
+        Turn search rows into note dicts. Searches only read titles and dates, so
+        'content' is None until load_note_contents() is called for the notes
+        that are actually going to be used.
+        """
         if not notes:
             return []
 
         formatted_notes = []
-        for note_id, title, content, timestamp in notes:
-            unix_timestamp = timestamp - 978307200
+        for row in notes:
+            # Bear stores Core Data timestamps (seconds since 2001-01-01)
+            unix_timestamp = row['modified'] + COCOA_EPOCH_OFFSET
             date_modified = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(unix_timestamp))
             formatted_notes.append({
-                'id': note_id,
-                'title': title,
-                'content': content,
+                'id': row['id'],
+                'title': row['title'],
+                'content': None,
                 'date_modified': date_modified
             })
         return formatted_notes
 
+    def load_note_contents(self, notes):
+        """Fill in the content of notes returned by a search, one query per batch of ids"""
+        pending = [note for note in notes if note['content'] is None]
+        rows = self._fetch_notes_in_batches([note['id'] for note in pending], "ZTEXT AS content")
+        for note in pending:
+            row = rows.get(note['id'])
+            note['content'] = (row['content'] if row else None) or ""
+
+        return notes
+
+    def _fetch_notes_in_batches(self, note_ids, columns, live_only=False):
+        """
+        Select columns (plus ZUNIQUEIDENTIFIER AS id) for the given note ids with
+        one IN (...) query per batch of ids. Returns a dict of rows keyed by id.
+        """
+        conn = self._get_bear_connection()
+        trashed_filter = "ZTRASHED = 0 AND " if live_only else ""
+        rows = {}
+
+        # Stay well below SQLite's limit on bound parameters
+        for start in range(0, len(note_ids), 500):
+            batch = note_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            for row in conn.execute(
+                f"SELECT ZUNIQUEIDENTIFIER AS id, {columns} FROM ZSFNOTE "
+                f"WHERE {trashed_filter}ZUNIQUEIDENTIFIER IN ({placeholders})",
+                batch
+            ):
+                rows[row['id']] = row
+        return rows
+
     def count_tokens(self, text):
         """Count tokens in the given text using the appropriate tokenizer"""
         if hasattr(self.tokenizer, "encode"):
@@ -380,12 +727,21 @@ class BearNotesAI:
         else:
             return all_results[0]
 
+    def _combine_notes(self, notes):
+        """Combine notes into a single document separated by note markers"""
+        # Join flat pieces instead of one f-string per note, so each note body is
+        # copied only once, straight into the combined document
+        pieces = []
+        for i, note in enumerate(notes):
+            if i:
+                pieces.append(NOTE_SEPARATOR)
+            pieces.extend(("NOTE: ", str(note['title']), "\n\n", str(note['content'])))
+        return "".join(pieces)
+
     def process_notes_together(self, notes, question):
         """Process notes using the appropriate chunking strategy based on token count"""
         # Combine notes into one document
-        combined_content = "\n\n===== NOTE SEPARATOR =====\n\n".join(
-            [f"NOTE: {note['title']}\n\n{note['content']}" for note in notes]
-        )
+        combined_content = self._combine_notes(notes)
 
         # Count tokens in the combined content and question
         question_with_prefix = f"Read the following documents and answer: {question}"
@@ -401,12 +757,13 @@ class BearNotesAI:
             reserved_response_tokens = self.model_params["response_tokens"]
             max_input_tokens = context_window - reserved_response_tokens
 
-            print(f"\nToken analysis:")
-            print(f"- Question tokens: {question_tokens}")
-            print(f"- Content tokens: {content_tokens}")
-            print(f"- Total tokens: {total_tokens}")
-            print(f"- Available context window: {context_window}")
-            print(f"- Max input tokens (after reserving {reserved_response_tokens} for response): {max_input_tokens}")
+            logger.info("Token analysis:")
+            logger.info("- Question tokens: %d", question_tokens)
+            logger.info("- Content tokens: %d", content_tokens)
+            logger.info("- Total tokens: %d", total_tokens)
+            logger.info("- Available context window: %d", context_window)
+            logger.info("- Max input tokens (after reserving %d for response): %d",
+                        reserved_response_tokens, max_input_tokens)
 
             # If content clearly exceeds the limit, warn the user before attempting
             if total_tokens > max_input_tokens and total_tokens > context_window:
@@ -438,16 +795,17 @@ class BearNotesAI:
             reserved_response_tokens = self.model_params["response_tokens"]
             max_input_tokens = available_tokens - reserved_response_tokens
 
-            print(f"\nToken analysis:")
-            print(f"- Question tokens: {question_tokens}")
-            print(f"- Content tokens: {content_tokens}")
-            print(f"- Total tokens: {total_tokens}")
-            print(f"- Available context window: {available_tokens}")
-            print(f"- Max input tokens (after reserving {reserved_response_tokens} for response): {max_input_tokens}")
+            logger.info("Token analysis:")
+            logger.info("- Question tokens: %d", question_tokens)
+            logger.info("- Content tokens: %d", content_tokens)
+            logger.info("- Total tokens: %d", total_tokens)
+            logger.info("- Available context window: %d", available_tokens)
+            logger.info("- Max input tokens (after reserving %d for response): %d",
+                        reserved_response_tokens, max_input_tokens)
 
             # If content fits within token limit, process it directly
             if total_tokens <= max_input_tokens:
-                print("\nContent fits within token limit - processing directly")
+                logger.info("Content fits within token limit - processing directly")
                 return self._process_content(combined_content, question)
 
             # Otherwise, use chunking strategy
@@ -522,22 +880,15 @@ class BearNotesAI:
         """Process each document separately, then synthesize results"""
         print("\nProcessing each document separately and then synthesizing...")
 
-        individual_results = []
-
-        for i, note in enumerate(notes):
-            print(f"\nProcessing note {i + 1}/{len(notes)}: {note['title']}")
-
-            # Create prompt for this individual note
-            individual_content = f"NOTE: {note['title']}\n\n{note['content']}"
-
-            # Process the individual note with a slightly modified question
-            individual_question = f"Extract key information from this document that's relevant to the following question: {question}"
-            result = self._process_content(individual_content, individual_question)
-            individual_results.append(result)
-
-            # Add a short delay between processing notes to avoid rate limiting
-            if i < len(notes) - 1:
-                time.sleep(0.5)
+        # Extract information from each note with a slightly modified question
+        individual_question = f"Extract key information from this document that's relevant to the following question: {question}"
+        prompts = [
+            (f"Processing note {i + 1}/{len(notes)}: {note['title']}",
+             f"NOTE: {note['title']}\n\n{note['content']}",
+             individual_question)
+            for i, note in enumerate(notes)
+        ]
+        individual_results = self._process_prompts(prompts)
 
         # Combine all individual results
         synthesis_content = "\n\n===== DOCUMENT SUMMARY SEPARATOR =====\n\n".join(
@@ -566,11 +917,10 @@ class BearNotesAI:
 
         print(f"Split content into {len(chunks)} chunks")
 
-        # Process each chunk
-        chunk_results = []
+        # For chunks, extract relevant information rather than answering directly
+        chunk_question = f"Extract key information from this document chunk that's relevant to the question: {question}"
+        prompts = []
         for i, chunk in enumerate(chunks):
-            print(f"\nProcessing chunk {i + 1}/{len(chunks)} ({self.count_tokens(chunk)} tokens)")
-
             # For first chunk, mention it's the beginning
             if i == 0:
                 chunk_prefix = "BEGINNING OF DOCUMENT: "
@@ -580,16 +930,11 @@ class BearNotesAI:
             else:
                 chunk_prefix = f"DOCUMENT CHUNK {i + 1}: "
 
-            chunk_content = chunk_prefix + chunk
+            prompts.append((f"Processing chunk {i + 1}/{len(chunks)} ({self.count_tokens(chunk)} tokens)",
+                            chunk_prefix + chunk,
+                            chunk_question))
 
-            # For chunks, extract relevant information rather than answering directly
-            chunk_question = f"Extract key information from this document chunk that's relevant to the question: {question}"
-            result = self._process_content(chunk_content, chunk_question)
-            chunk_results.append(result)
-
-            # Add a short delay between processing chunks
-            if i < len(chunks) - 1:
-                time.sleep(0.5)
+        chunk_results = self._process_prompts(prompts)
 
         # Combine chunk results
         synthesis_content = "\n\n===== CHUNK SUMMARY SEPARATOR =====\n\n".join(
@@ -640,9 +985,7 @@ class BearNotesAI:
 
         # If only a few notes, process them directly using token chunking
         if len(notes) <= 5:
-            combined_content = "\n\n===== NOTE SEPARATOR =====\n\n".join(
-                [f"NOTE: {note['title']}\n\n{note['content']}" for note in notes]
-            )
+            combined_content = self._combine_notes(notes)
             max_input_tokens = self.max_tokens - self.model_params["response_tokens"]
             return self._process_with_token_chunking(combined_content, question, max_input_tokens)
 
@@ -664,9 +1007,7 @@ class BearNotesAI:
                 group_result = self._process_with_recursive_summarization(group, question)
             else:
                 # Process smaller group directly
-                combined_group_content = "\n\n===== NOTE SEPARATOR =====\n\n".join(
-                    [f"NOTE: {note['title']}\n\n{note['content']}" for note in group]
-                )
+                combined_group_content = self._combine_notes(group)
                 group_question = f"Extract key information from these documents that's relevant to the question: {question}"
                 group_result = self._process_content(combined_group_content, group_question)
 
@@ -687,14 +1028,41 @@ class BearNotesAI:
 
         return final_result
 
+    def _process_prompts(self, prompts):
+        """
+        Process independent (label, content, question) prompts and return the
+        results in the original order. Prompts are fanned out over a thread pool
+        when max_workers > 1, otherwise they run one at a time with a short delay.
+        """
+        def _run_prompt(prompt):
+            label, content, question = prompt
+            print(f"\n{label}")
+            return self._process_content(content, question)
+
+        if self.max_workers > 1 and len(prompts) > 1:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                return list(executor.map(_run_prompt, prompts))
+
+        results = []
+        for i, prompt in enumerate(prompts):
+            results.append(_run_prompt(prompt))
+
+            # Add a short delay between prompts to avoid rate limiting
+            if i < len(prompts) - 1:
+                time.sleep(0.5)
+
+        return results
+
     def _process_content(self, content, question):
         """Process a single content chunk with the given question"""
-        if self.use_chatgpt:
-            return self.ask_chatgpt(content, question)
-        elif self.use_docker_model:
-            return self.ask_docker_model(content, question)
-        else:
-            return self.ask_ollama_cli(content, question)
+        # Bound in-flight model calls, including when parallel groups fan out chunks
+        with self._model_slots:
+            if self.use_chatgpt:
+                return self.ask_chatgpt(content, question)
+            elif self.use_docker_model:
+                return self.ask_docker_model(content, question)
+            else:
+                return self.ask_ollama_cli(content, question)
 
     def ask_ollama_cli(self, content, question):
         """Send a query to Ollama CLI"""
@@ -710,14 +1078,18 @@ class BearNotesAI:
             text=True
         )
 
-        # Show progress while waiting
-        while process.poll() is None:
-            print(".", end="", flush=True)
-            time.sleep(0.5)
+        # Show progress while waiting. communicate() keeps draining the pipes
+        # between ticks, so a long answer can't fill the pipe buffer and stall
+        # the model, and we return as soon as the process exits
+        while True:
+            try:
+                stdout, stderr = process.communicate(timeout=0.5)
+                break
+            except subprocess.TimeoutExpired:
+                print(".", end="", flush=True)
 
         print()  # New line after progress dots
 
-        stdout, stderr = process.communicate()
         if process.returncode == 0:
             return stdout
         else:
@@ -728,12 +1100,6 @@ class BearNotesAI:
         if not self.api_key:
             return "Error: OpenAI API key is required for ChatGPT"
 
-        url = "https://api.openai.com/v1/chat/completions"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-
         data = {
             "model": self.model_name or "gpt-4o",
             "messages": [
@@ -746,7 +1112,7 @@ class BearNotesAI:
 
         print("Working", end="", flush=True)
         try:
-            response = requests.post(url, headers=headers, json=data)
+            response = _http.post(OPENAI_CHAT_COMPLETIONS_URL, headers=self._chatgpt_headers, json=data)
             print()  # New line after progress
             response.raise_for_status()
             return response.json()["choices"][0]["message"]["content"]
@@ -761,7 +1127,6 @@ class BearNotesAI:
         prompt = f"Read this document and answer: {question}\n\n{content}"
 
         # Format request for OpenAI-compatible API
-        headers = {"Content-Type": "application/json"}
         data = {
             "model": self.model_name,
             "prompt": prompt,
@@ -772,9 +1137,8 @@ class BearNotesAI:
         print(f"Working with Docker Model Runner model: {self.model_name}", end="", flush=True)
         try:
             # Make the API call to Docker Model Runner's OpenAI-compatible endpoint
-            response = requests.post(
+            response = _http.post(
                 f"{self.docker_model_endpoint}/completions",
-                headers=headers,
                 json=data,
                 timeout=180
             )
@@ -914,7 +1278,8 @@ def main():
     search_group = parser.add_argument_group('Search Options')
     search_group.add_argument("-t", "--tag", help="Tag to search for")
     search_group.add_argument("-k", "--keyword", help="Keyword to search for")
-    search_group.add_argument("-u", "--url", help="Bear callback URL")
+    search_group.add_argument("-u", "--url", action="append",
+                              help="Bear callback URL (repeat to process several notes)")
 
     # AI options
     ai_group = parser.add_argument_group('AI Options')
@@ -968,6 +1333,9 @@ def main():
     if not args.list and not args.question:
         parser.error("--question is required unless --list is used")
 
+    # Model and token diagnostics are only shown with --verbose
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s")
+
     processor = BearNotesAI(
         use_chatgpt=args.chatgpt,
         use_docker_model=args.docker_model,
@@ -977,36 +1345,59 @@ def main():
         docker_model_endpoint=args.docker_model_endpoint,
         max_tokens=args.max_tokens,
         chunking_strategy=args.chunking_strategy,
-        overlap_tokens=args.overlap_tokens
+        overlap_tokens=args.overlap_tokens,
+        max_workers=args.max_workers if args.parallel else 1
     )
+    with processor:
+        run(processor, args)
 
+
+def run(processor, args):
+    """Search for the requested notes and process them with the selected AI"""
     matching_notes = []
 
+    # Push the limit down into the search query so notes beyond it are never
+    # loaded. One extra row is requested to tell whether the limit cut anything off
+    limit = None
+    if args.limit:
+        if args.limit <= 0:
+            print("\nWarning: Invalid limit (must be positive). Processing all notes.")
+        else:
+            limit = args.limit
+    search_limit = limit + 1 if limit else None
+
     # Search for notes
     try:
         if args.url:
-            note_id = processor.extract_note_id_from_url(args.url)
-            note_id, title, content = processor.get_note_by_id(note_id)
-            matching_notes.append({
-                'id': note_id,
-                'title': title,
-                'content': content,
-                'date_modified': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
-            })
-            print(f"Found note: {title}")
-        elif args.tag and args.keyword:
-            # Use combined tag and keyword search
-            combined_notes = processor.search_notes_by_tag_and_keyword(args.tag, args.keyword)
-            matching_notes.extend(combined_notes)
-            print(f"Found {len(combined_notes)} notes with tag #{args.tag} and keyword '{args.keyword}'")
-        elif args.tag:
-            tag_notes = processor.search_notes_by_tag(args.tag)
-            matching_notes.extend(tag_notes)
-            print(f"Found {len(tag_notes)} notes with tag #{args.tag}")
-        elif args.keyword:
-            keyword_notes = processor.search_notes_by_keyword(args.keyword)
-            matching_notes.extend(keyword_notes)
-            print(f"Found {len(keyword_notes)} notes with keyword '{args.keyword}'")
+            # All the notes are loaded with a single query; repeated URLs are only read once
+            note_ids = list(dict.fromkeys(processor.extract_note_id_from_url(url) for url in args.url))
+            matching_notes = processor.get_notes_by_ids(note_ids)
+            if len(matching_notes) == 1:
+                print(f"Found note: {matching_notes[0]['title']}")
+            else:
+                print(f"Found {len(matching_notes)} notes from URLs")
+        else:
+            if args.tag and args.keyword:
+                # Use combined tag and keyword search
+                matching_notes = processor.search_notes_by_tag_and_keyword(args.tag, args.keyword,
+                                                                           limit=search_limit)
+                search_description = f"with tag #{args.tag} and keyword '{args.keyword}'"
+            elif args.tag:
+                matching_notes = processor.search_notes_by_tag(args.tag, limit=search_limit)
+                search_description = f"with tag #{args.tag}"
+            else:
+                matching_notes = processor.search_notes_by_keyword(args.keyword, limit=search_limit)
+                search_description = f"with keyword '{args.keyword}'"
+
+            limited = limit is not None and len(matching_notes) > limit
+            if limited:
+                del matching_notes[limit:]
+            print(f"Found {len(matching_notes)}{'+' if limited else ''} notes {search_description}")
+
+            if limited:
+                print("\n" + "=" * 50)
+                print(f"  LIMITED TO THE {limit} MOST RECENT NOTES")
+                print("=" * 50 + "\n")
     except Exception as e:
         print(f"Error: {e}")
         return
@@ -1015,33 +1406,20 @@ def main():
         print("No matching notes found.")
         return
 
-    # Apply limit IMMEDIATELY after finding notes
-    # Save original count before limiting
-    original_count = len(matching_notes)
-
-    # Check if limit is provided
-    if args.limit:
-        try:
-            limit = int(args.limit)
-            if limit <= 0:
-                print("\nWarning: Invalid limit (must be positive). Processing all notes.")
-            elif limit < original_count:
-                # Actually limit the notes list
-                matching_notes = matching_notes[:limit]
-                print("\n" + "=" * 50)
-                print(f"  LIMITED TO {limit} OF {original_count} NOTES")
-                print("=" * 50 + "\n")
-        except (ValueError, TypeError):
-            print("\nWarning: Invalid limit value. Processing all notes.")
-
     # Display matching notes (after limiting)
     total_notes = len(matching_notes)  # This will be the limited count if limit was applied
-    print("\nMatching Notes:")
+    # Note bodies are only read from the database when they are needed
+    if args.verbose:
+        processor.load_note_contents(matching_notes)
+
+    # Build the listing first and write it once rather than printing per note
+    listing = ["\nMatching Notes:"]
     for i, note in enumerate(matching_notes, 1):
-        print(f"{i}. {note['title']} (Modified: {note['date_modified']})")
+        listing.append(f"{i}. {note['title']} (Modified: {note['date_modified']})")
         if args.verbose:
             token_count = processor.count_tokens(note['content'])
-            print(f"   - Estimated tokens: {token_count}")
+            listing.append(f"   - Estimated tokens: {token_count}")
+    print("\n".join(listing))
 
     # Just list the notes if requested
     if args.list:
@@ -1060,11 +1438,13 @@ def main():
 
     # Ask for confirmation before processing
     if not args.yes:
-        confirmation = input(f"\nFound {total_notes} matching notes. Process them? (y/n) [y]: ")
-        if confirmation.lower() and confirmation.lower() != 'y':
+        confirmation = input(f"\nFound {total_notes} matching notes. Process them? (y/n) [y]: ").strip().lower()
+        if confirmation not in ('', 'y'):
             print("Operation cancelled.")
             return
 
+    processor.load_note_contents(matching_notes)
+
     # Choose processing method
     ai_type = "ChatGPT" if args.chatgpt else "Docker Model Runner" if args.docker_model else f"Ollama ({args.model})"
 